@@ -1,7 +1,7 @@
-import io
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from openai import OpenAI
 
 # Remove environment variable support; use dashboard (session state) instead
 # Initialize session state defaults
@@ -12,80 +12,135 @@ if "OPENAI_MODEL" not in st.session_state:
 if "ACTIVE_VECTOR_STORE_ID" not in st.session_state:
     st.session_state["ACTIVE_VECTOR_STORE_ID"] = None
 
-# Initialize OpenAI client from dashboard-provided API key
-client = OpenAI(api_key=st.session_state.get("OPENAI_API_KEY")) if st.session_state.get("OPENAI_API_KEY") else None
+# Restore the active vector store from the URL so a browser reload doesn't
+# force the user to re-pick it.
+if "vs" in st.query_params and not st.session_state.get("ACTIVE_VECTOR_STORE_ID"):
+    st.session_state["ACTIVE_VECTOR_STORE_ID"] = st.query_params["vs"]
+
+# Hoisted per-rerun locals: session_state lookups go through a proxy, so resolve
+# the hot values once and reuse them in loops, handlers, and cache keys.
+api_key = st.session_state.get("OPENAI_API_KEY", "")
+active_id = st.session_state.get("ACTIVE_VECTOR_STORE_ID")
+has_client = bool(api_key)
+
+# Initialize OpenAI client from dashboard-provided API key.
+# Cached per API key so reruns reuse the same client (and its HTTP connection pool)
+# instead of rebuilding it on every widget interaction.
+@st.cache_resource
+def get_client(api_key: str):
+    if not api_key:
+        return None
+    # Import deferred: the openai/pydantic/httpx import graph costs hundreds of
+    # ms at cold start, so only pay it once a key is actually provided.
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+client = get_client(api_key)
 
 # Default model used for Responses API calls
 MODEL_NAME = st.session_state.get("OPENAI_MODEL", "gpt-4.1-mini")
 
-# Helper to resolve the active vector store id (only session state)
-def get_active_vector_store_id():
-    return st.session_state.get("ACTIVE_VECTOR_STORE_ID")
+# Stable prompt prefix for the Responses API; keeping it constant lets the
+# provider cache the prefix across calls.
+_PROMPT_TMPL = (
+    "You’re assigned a task to determine whether a bug bounty program exists for the given input. "
+    "Use the file_search tool on the provided vector store to verify. "
+    "Input: {input}"
+)
+
+# Output schema enforced server-side, so the prompt no longer needs the
+# "respond strictly in JSON" boilerplate.
+_RESPONSE_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "bbp",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "Found": {"type": "string", "enum": ["Yes", "No"]},
+                "Source": {"type": "string"},
+                "Rewards": {"type": "string", "enum": ["Yes", "No"]},
+                "Program Url": {"type": "string"},
+            },
+            "required": ["Found", "Source", "Rewards", "Program Url"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    }
+}
+
+# Run a query through the Responses API and extract (output_text, citations).
+# Cached so re-submitting the same input against the same model/store is a
+# local lookup instead of a fresh LLM + file_search round-trip.
+@st.cache_data(ttl=3600, show_spinner=False)
+def run_query(api_key: str, model: str, vs_id: str, user_text: str):
+    response = get_client(api_key).responses.create(
+        model=model,
+        input=_PROMPT_TMPL.format(input=user_text),
+        tools=[{
+            "type": "file_search",
+            "vector_store_ids": [vs_id],
+            "max_num_results": 5
+        }],
+        text=_RESPONSE_FORMAT,
+    )
+
+    # Extract output text (and optional citations) from the response. The SDK
+    # returns typed models, so use direct attribute access and join the parts
+    # once rather than getattr-with-default walks and string +=.
+    text_parts = []
+    citations = []
+    try:
+        for item in (response.output or []):
+            if item.type != "message":
+                continue
+            for content in (item.content or []):
+                if content.type != "output_text":
+                    continue
+                text_parts.append(content.text or "")
+                citations.extend(
+                    {"file_id": ann.file_id, "filename": getattr(ann, "filename", "")}
+                    for ann in (content.annotations or [])
+                    if ann.type == "file_citation"
+                )
+        output_text = "".join(text_parts)
+    except Exception:
+        # Fallback: stringify full response if structured parsing fails
+        output_text = str(response)
+    return output_text, citations
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="Bug Bounty Program Finder", page_icon="🔎", layout="centered")
 st.title("Bug Bounty Program Finder")
 st.write("Enter email, org name, domain/URLs, or any info to see if a bug bounty program (BBP) exists.")
 
-user_text = st.text_area(
-    "Input",
-    placeholder="e.g., example.com, security@example.com, Org Name",
-    height=150,
-)
-
-if st.button("Find Program"):
+# Form defers reruns until submission, so typing in the text area no longer
+# re-executes the whole script per keystroke.
+with st.form("query_form", clear_on_submit=False):
+    user_text = st.text_area(
+        "Input",
+        placeholder="e.g., example.com, security@example.com, Org Name",
+        height=150,
+    )
+    submitted = st.form_submit_button("Find Program")
+
+if submitted:
     if not user_text.strip():
         st.warning("Please provide some input (domain, email, org name, etc.).")
-    elif not client:
+    elif not has_client:
         st.error("OpenAI API key is not set. Please set it in the sidebar under Settings.")
-    elif not get_active_vector_store_id():
+    elif not active_id:
         st.error("No active vector store set. Create one or set an ID in the 'Manage Knowledge Base' section.")
     else:
         with st.spinner("Searching for Bug Bounty Program..."):
             try:
-                # Build a concise instruction leveraging File Search tool
-                prompt = (
-                    # "You're assigned a task to determine whether a bug bounty program exists for the given input. "
-                    # "Use the file_search tool on the provided vector store to verify. "
-                    # "Respond strictly only in JSON object 'Found' (Yes/No), 'Source', 'Rewards' (Yes/No), and 'Program Url'. "
-                    # f"Input: {user_text.strip()}"
-                    "You’re assigned a task to determine whether a bug bounty program exists for the given input. "
-                    "Use the file_search tool on the provided vector store to verify. "
-                    "Respond strictly in a **single JSON object only**, with no explanations or extra text. "
-                    "Fields required: 'Found' (Yes/No), 'Source', 'Rewards' (Yes/No), 'Program Url'. "
-                    f"Input: {user_text.strip()}"
-
-                )
-
-                response = client.responses.create(
-                    model=MODEL_NAME,
-                    input=prompt,
-                    tools=[{
-                        "type": "file_search",
-                        "vector_store_ids": [get_active_vector_store_id()]
-                    }]
+                output_text, citations = run_query(
+                    api_key,
+                    MODEL_NAME,
+                    active_id,
+                    user_text.strip(),
                 )
 
-                # Extract output text (and optional citations) from the response
-                output_text = ""
-                citations = []
-                try:
-                    for item in (response.output or []):
-                        if getattr(item, "type", None) == "message":
-                            for content in (item.content or []):
-                                if getattr(content, "type", None) == "output_text":
-                                    output_text += content.text or ""
-                                    anns = getattr(content, "annotations", None) or []
-                                    for ann in anns:
-                                        if getattr(ann, "type", None) == "file_citation":
-                                            citations.append({
-                                                "file_id": getattr(ann, "file_id", ""),
-                                                "filename": getattr(ann, "filename", "")
-                                            })
-                except Exception:
-                    # Fallback: stringify full response if structured parsing fails
-                    output_text = str(response)
-
                 if output_text:
                     st.success("Result")
                     # Show as JSON/code block for readability
@@ -109,7 +164,7 @@ kb = st.sidebar
 kb.header("Settings")
 kb.caption("Provide your OpenAI API key and preferred model.")
 kb.text_input("OpenAI API Key", type="password", key="OPENAI_API_KEY")
-if st.session_state.get("OPENAI_API_KEY"):
+if api_key:
     kb.success("API key set")
 else:
     kb.warning("Set your API key to enable OpenAI features.")
@@ -121,14 +176,43 @@ kb.caption("Upload files, select/create vector stores, and manage existing files
 # Active vector store controls (sidebar)
 
 
-vs_name = kb.text_input("New Vector Store Name", value="knowledge_base")
-if kb.button("Create New Vector Store", key="btn_create_vs"):
+# Memoized listings so sidebar reruns (keystrokes, checkbox toggles) hit a local
+# cache instead of re-fetching over the network; keyed by API key so switching
+# keys invalidates. Short TTL keeps data reasonably fresh between explicit refreshes.
+@st.cache_data(ttl=30, show_spinner=False)
+def list_vector_stores(api_key: str):
+    listing = get_client(api_key).vector_stores.list()
+    return getattr(listing, "data", [])
+
+@st.cache_data(ttl=30, show_spinner=False)
+def list_vs_files(api_key: str, vs_id: str):
+    listing = get_client(api_key).vector_stores.files.list(vector_store_id=vs_id)
+    return getattr(listing, "data", [])
+
+# File metadata is immutable for the lifetime of a file id, so cache filename
+# lookups indefinitely instead of paying one retrieve call per file per rerun.
+# Exceptions are left to propagate: cache_data does not cache raising calls,
+# so a transient retrieve failure is retried instead of pinned as unknown.
+@st.cache_data(show_spinner=False)
+def get_filename(api_key: str, file_id: str):
+    fobj = get_client(api_key).files.retrieve(file_id)
+    return getattr(fobj, "filename", None) or getattr(fobj, "name", None)
+
+# Same form treatment for the store name field: no rerun per keystroke.
+with kb.form("create_vs_form"):
+    vs_name = st.text_input("New Vector Store Name", value="knowledge_base")
+    create_vs_submitted = st.form_submit_button("Create New Vector Store")
+if create_vs_submitted:
     try:
-        if not st.session_state.get("OPENAI_API_KEY"):
+        if not has_client:
             kb.error("Set your OpenAI API key in Settings first.")
         else:
             created_vs = client.vector_stores.create(name=vs_name)
             st.session_state["ACTIVE_VECTOR_STORE_ID"] = created_vs.id
+            active_id = created_vs.id
+            st.query_params["vs"] = created_vs.id
+            list_vector_stores.clear()
+            st.session_state["stores_stale"] = True
             kb.success(f"Created new vector store: {created_vs.id}")
     except Exception as e:
         kb.error(f"Failed to create vector store: {e}")
@@ -137,43 +221,66 @@ if kb.button("Create New Vector Store", key="btn_create_vs"):
 kb.subheader("Vector Stores")
 # Small refresh button close to header
 if kb.button("↻ Refresh", key="btn_refresh_stores"):
+    list_vector_stores.clear()
+    list_vs_files.clear()
+    st.session_state["stores_stale"] = True
     st.rerun()
 
-def list_vector_stores():
-    try:
-        if not st.session_state.get("OPENAI_API_KEY") or not client:
-            kb.info("Set your OpenAI API key in Settings to load stores.")
-            return []
-        listing = client.vector_stores.list()
-        return getattr(listing, "data", [])
-    except Exception as e:
-        # Occasionally right after a deletion, the SDK may return a transient 404 while the backend refreshes
-        if "Vector store not found" in str(e):
-            kb.info("Refreshing stores...")
-            st.rerun()
-        else:
-            kb.error(f"Failed to list vector stores: {e}")
-        return []
-
-active_id = get_active_vector_store_id()
-stores = list_vector_stores()
+stores = []
+if not has_client:
+    kb.info("Set your OpenAI API key in Settings to load stores.")
+else:
+    # Session-level cache on top of the cache_data TTL: plain reruns render
+    # from session state and only refetch when a handler marks the list stale.
+    # The key the cache was fetched under is stored alongside it so swapping
+    # API keys refetches instead of serving the previous account's stores.
+    if (
+        "stores_cache" not in st.session_state
+        or st.session_state.get("stores_cache_key") != api_key
+        or st.session_state.get("stores_stale")
+    ):
+        try:
+            st.session_state["stores_cache"] = list_vector_stores(api_key)
+            st.session_state["stores_cache_key"] = api_key
+            st.session_state["stores_stale"] = False
+        except Exception as e:
+            # Occasionally right after a deletion, the SDK may return a transient 404 while the backend refreshes
+            if "Vector store not found" in str(e):
+                kb.info("Refreshing stores...")
+                st.rerun()
+            else:
+                kb.error(f"Failed to list vector stores: {e}")
+    if st.session_state.get("stores_cache_key") == api_key:
+        stores = st.session_state.get("stores_cache") or []
+# Render the active store first with full controls; inactive stores stay cheap
+# (a single "Open" button) until explicitly opened, so per-rerun widget
+# construction is O(1) + O(opened) rather than O(stores).
+stores = sorted(stores, key=lambda vs: getattr(vs, "id", "") != active_id)
 for vs in stores:
     vs_id = getattr(vs, "id", "")
     vs_name = getattr(vs, "name", "(unnamed)")
     label = f"{vs_name} ({vs_id})"
-    with kb.expander(label, expanded=(vs_id == active_id)):
+    is_active = vs_id == active_id
+    with kb.expander(label, expanded=is_active):
+        if not is_active and not st.session_state.get(f"expand_{vs_id}", False):
+            if kb.button("Open", key=f"open_{vs_id}"):
+                st.session_state[f"expand_{vs_id}"] = True
+                st.rerun()
+            continue
         # Active badge and set active action
-        if vs_id == active_id:
+        if is_active:
             kb.success("Active")
         else:
             if kb.button("Set Active", key=f"btn_set_active_{vs_id}"):
                 st.session_state["ACTIVE_VECTOR_STORE_ID"] = vs_id
+                active_id = vs_id
+                st.query_params["vs"] = vs_id
                 kb.success(f"Active vector store set: {vs_id}")
 
         # Delete vector store action (also delete related files)
         if kb.button("Delete Store", key=f"btn_delete_store_{vs_id}"):
             try:
-                if not client:
+                if not has_client:
                     kb.error("Set your OpenAI API key in Settings first.")
                 else:
                     # 1) List files associated with this store
@@ -182,28 +289,44 @@ for vs in stores:
                         refs = getattr(listing, "data", [])
                     except Exception:
                         refs = []
-                    deleted_files = 0
-                    for ref in refs:
-                        fid = getattr(ref, "file_id", None) or getattr(ref, "id", None)
-                        if not fid:
-                            continue
-                        # 2) Detach from vector store (best-effort)
+                    fids = [
+                        f for f in (
+                            getattr(ref, "file_id", None) or getattr(ref, "id", None)
+                            for ref in refs
+                        ) if f
+                    ]
+
+                    # 2) Detach from vector store (best-effort), then
+                    # 3) delete from the Files API; counts successful deletes
+                    def _drop(fid):
                         try:
                             client.vector_stores.files.delete(vector_store_id=vs_id, file_id=fid)
                         except Exception:
                             pass
-                        # 3) Delete file from Files API
                         try:
                             client.files.delete(fid)
-                            deleted_files += 1
-                        except Exception as e:
-                            kb.warning(f"Failed to delete file {fid}: {e}")
+                            return 1
+                        except Exception:
+                            return 0
+
+                    # Fan out per-file deletions; each costs two round-trips, so
+                    # a store with many files would otherwise block for 2N RTTs.
+                    deleted_files = 0
+                    if fids:
+                        with ThreadPoolExecutor(max_workers=min(16, len(fids))) as ex:
+                            deleted_files = sum(ex.map(_drop, fids))
 
                     # 4) Delete the vector store
                     client.vector_stores.delete(vector_store_id=vs_id)
                     # Clear active if we just deleted it
-                    if get_active_vector_store_id() == vs_id:
+                    if active_id == vs_id:
                         st.session_state["ACTIVE_VECTOR_STORE_ID"] = None
+                        active_id = None
+                        st.query_params.pop("vs", None)
+                    list_vector_stores.clear()
+                    list_vs_files.clear()
+                    get_filename.clear()
+                    st.session_state["stores_stale"] = True
                     kb.success(f"Deleted vector store: {vs_id} (and {deleted_files} related files)")
                     st.rerun()
             except Exception as e:
@@ -213,23 +336,32 @@ for vs in stores:
         show_files = kb.checkbox("Show files", key=f"chk_show_files_{vs_id}")
         if show_files:
             try:
-                if not client:
+                if not has_client:
                     kb.info("Set your OpenAI API key in Settings to load files.")
                 else:
-                    listing = client.vector_stores.files.list(vector_store_id=vs_id)
-                    refs = getattr(listing, "data", [])
+                    refs = list_vs_files(api_key, vs_id)
                     if not refs:
                         kb.write("No files.")
                     else:
-                        for ref in refs:
-                            fid = getattr(ref, "file_id", None) or getattr(ref, "id", None)
-                            filename = None
-                            if fid:
-                                try:
-                                    fobj = client.files.retrieve(fid)
-                                    filename = getattr(fobj, "filename", None) or getattr(fobj, "name", None)
-                                except Exception:
-                                    filename = None
+                        # Fan out filename lookups so the first expansion overlaps
+                        # the per-file round-trips instead of paying them serially.
+                        fids = [getattr(ref, "file_id", None) or getattr(ref, "id", None) for ref in refs]
+
+                        # Tolerate dangling refs per row: a failed retrieve
+                        # renders as "(unknown)" with its Delete button intact
+                        # instead of aborting the whole listing. The failure is
+                        # still never cached, so later reruns retry.
+                        def _name_or_none(fid):
+                            if not fid:
+                                return None
+                            try:
+                                return get_filename(api_key, fid)
+                            except Exception:
+                                return None
+
+                        with ThreadPoolExecutor(max_workers=min(16, len(fids))) as ex:
+                            names = list(ex.map(_name_or_none, fids))
+                        for fid, filename in zip(fids, names):
                             # Compact row in sidebar: filename left, delete button right
                             col1, col2 = kb.columns([6, 2])
                             with col1:
@@ -238,6 +370,8 @@ for vs in stores:
                                 if kb.button("Delete", key=f"btn_del_{vs_id}_{fid}"):
                                     try:
                                         client.vector_stores.files.delete(vector_store_id=vs_id, file_id=fid)
+                                        list_vs_files.clear()
+                                        get_filename.clear()
                                         kb.success(f"Deleted: {filename or fid}")
                                         st.rerun()
                                     except Exception as e:
@@ -251,24 +385,27 @@ for vs in stores:
                     kb.error(f"Failed to list files for store: {e}")
 
 
-# Poll until a file is indexed in the active vector store
+# Poll until a file is indexed in the given vector store. Takes the store id
+# explicitly so it stays safe to call from worker threads, which must not
+# reach back into Streamlit session state.
 
-def wait_until_file_indexed(file_id: str, timeout_sec: int = 60, poll_interval: float = 1.0):
+def wait_until_file_indexed(vsid: str, file_id: str, timeout_sec: int = 60):
     start = time.time()
+    # Poll the per-file status endpoint directly (no O(files) list scan) and
+    # back off exponentially so quick files finish fast and slow ones poll gently.
+    delay = 0.5
     while time.time() - start < timeout_sec:
         try:
-            listing = client.vector_stores.files.list(vector_store_id=get_active_vector_store_id())
-            data = getattr(listing, "data", [])
-            for f in data:
-                if getattr(f, "id", "") == file_id:
-                    status = getattr(f, "status", "")
-                    if status in ("completed", "finished"):
-                        return "completed"
-                    if status in ("failed", "error"):
-                        return status
-            time.sleep(poll_interval)
+            f = client.vector_stores.files.retrieve(vector_store_id=vsid, file_id=file_id)
+            status = getattr(f, "status", "")
+            if status in ("completed", "finished"):
+                return "completed"
+            if status in ("failed", "error"):
+                return status
         except Exception:
-            time.sleep(poll_interval)
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 8.0)
     return "timeout"
 
 # Upload section
@@ -282,34 +419,53 @@ uploaded_files = kb.file_uploader(
 if kb.button("Upload"):
     if not uploaded_files:
         kb.warning("Please choose one or more files to upload.")
-    elif not get_active_vector_store_id():
+    elif not active_id:
         kb.error("No active vector store set. Create one or set an ID above.")
-    elif not client:
+    elif not has_client:
         kb.error("Set your OpenAI API key in Settings first.")
     else:
         with st.spinner("Uploading and indexing files..."):
-            results = []
-            for uf in uploaded_files:
+            vsid = active_id
+
+            # Upload + attach + poll for one file; errors are returned, not
+            # rendered, so all Streamlit writes stay on the main thread.
+            def _process(uf):
                 try:
-                    # 1) Upload the file to the File API
-                    content = uf.getvalue()
-                    file_tuple = (uf.name, io.BytesIO(content))
-                    created = client.files.create(file=file_tuple, purpose="assistants")
+                    # 1) Upload the file to the File API. UploadedFile is
+                    # file-like, so hand it over as-is instead of copying the
+                    # whole payload into a fresh bytes + BytesIO pair.
+                    uf.seek(0)
+                    created = client.files.create(file=(uf.name, uf), purpose="assistants")
 
                     # 2) Add the file to the active vector store
                     client.vector_stores.files.create(
-                        vector_store_id=get_active_vector_store_id(),
+                        vector_store_id=vsid,
                         file_id=created.id,
                     )
 
                     # 3) Check status by polling
-                    status = wait_until_file_indexed(created.id, timeout_sec=90)
-                    results.append((uf.name, created.id, status))
+                    status = wait_until_file_indexed(vsid, created.id, timeout_sec=90)
+                    return (uf.name, created.id, status, None)
                 except Exception as e:
-                    kb.error(f"Failed to upload {uf.name}: {e}")
+                    return (uf.name, None, None, e)
+
+            # Fan out across files so uploads and indexing overlap instead of
+            # paying (upload + index) serially per file.
+            with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as ex:
+                results = list(ex.map(_process, uploaded_files))
+
             kb.success("Upload finished:")
-            for name, fid, status in results:
-                kb.write(f"- {name} [{fid}] status: {status}")
+            for name, fid, status, err in results:
+                if err is not None:
+                    kb.error(f"Failed to upload {name}: {err}")
+                else:
+                    kb.write(f"- {name} [{fid}] status: {status}")
+
+            # Uploads mutate the store contents, so drop the cached listings
+            # like the Create/Delete handlers do.
+            if any(err is None for _, _, _, err in results):
+                list_vs_files.clear()
+                st.session_state["stores_stale"] = True
 
 
 # Optional helper to show which vector store is configured
\ No newline at end of file